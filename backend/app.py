@@ -2,19 +2,35 @@
 """
 MONTE CARLO FANTASY FOOTBALL DRAFT SIMULATOR BACKEND
 """
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 import csv
 from datetime import datetime
-from fastapi import FastAPI, File, HTTPException, Response, UploadFile
+from fastapi import FastAPI, File, HTTPException, Query, Response, UploadFile
+from fastapi.responses import ORJSONResponse
+from functools import lru_cache
+import io
+import math
 from motor.motor_asyncio import AsyncIOMotorClient
+import multiprocessing
+import numpy as np
 from odmantic import AIOEngine, ObjectId
-import random
-from sklearn.base import RegressorMixin
-from sklearn.linear_model import LogisticRegression
+import os
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
-import time
 from typing import List
 
-from models.config import DRAFT_YEAR, LOCAL, ROUND_SIZE, SNAKE_DRAFT
+from models.config import (
+    DRAFT_YEAR_KEY,
+    LOCAL,
+    MONTE_CARLO_SECONDS,
+    MONTE_CARLO_TOLERANCE,
+    ROUND_SIZE,
+    SIMULATED_DRAFT_MAX_RUNS,
+    SIMULATED_DRAFT_PLAYERS,
+    SNAKE_DRAFT,
+)
 from models.player import Player, Players, PlayerPoints
 from models.position import PositionMaxPoints, PositionSizes, PositionTierDistributions
 from models.team import (
@@ -24,8 +40,19 @@ from models.team import (
     LogisticRegressionVariables,
     LeagueSimple,
     MonteCarloSimulationResult,
+    SimulatedDraftResult,
+    SimulatedPick,
     Team,
 )
+from fastlr import SoftmaxRegression
+from simulation import (
+    build_sim_arrays,
+    build_weights_table,
+    randomized_team_points,
+    run_drafts,
+    run_trials,
+    simulate_next_pick,
+)
 
 
 # Metadata
@@ -53,6 +80,10 @@ tags_metadata = [
 ]
 
 
+# Number of worker processes for the Monte Carlo simulations
+MONTE_CARLO_WORKERS = os.cpu_count() or 1
+
+
 # Initialize app and engine
 if LOCAL:
     print("Running locally")
@@ -60,8 +91,39 @@ if LOCAL:
 else:
     print("Running in Docker")
     client = AsyncIOMotorClient("mongodb://mongodb:27017")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the models' indexes in the database and the worker processes' pool
+    when the app starts, and shut the worker processes down when it stops
+    """
+    await engine.configure_database([League, Draft])
+
+    # Start the workers from a fork server with the simulation module preloaded,
+    # rather than forking this process, which is already running threads
+    # (spawning them instead where fork servers are not available)
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("forkserver")
+        mp_context.set_forkserver_preload(["simulation"])
+    else:
+        mp_context = multiprocessing.get_context("spawn")
+    app.state.process_pool = ProcessPoolExecutor(
+        max_workers=MONTE_CARLO_WORKERS, mp_context=mp_context
+    )
+    try:
+        yield
+    finally:
+        app.state.process_pool.shutdown()
+
+
 app = FastAPI(
-    title="FF Monte Carlo Draft Simulator", version="0.0.1", openapi_tags=tags_metadata
+    title="FF Monte Carlo Draft Simulator",
+    version="0.0.1",
+    openapi_tags=tags_metadata,
+    default_response_class=ORJSONResponse,  # Faster serialization of large leagues
+    lifespan=lifespan,
 )
 engine = AIOEngine(
     database="fantasy-football",
@@ -69,6 +131,10 @@ engine = AIOEngine(
 )
 
 
+# Values of the Simulator column that mark the simulator's team
+SIMULATOR_VALUES = frozenset({"True", "true", "1"})
+
+
 # Include origins for CORS
 origins = [
     "http://localhost",
@@ -95,6 +161,46 @@ async def get_a_league_by_id(league_id: ObjectId) -> League:
     return league
 
 
+async def set_league_fields_by_id(league_id: ObjectId, fields: dict):
+    """
+    Set fields of a league directly in the database, without loading the league
+    """
+    result = await engine.get_collection(League).update_one(
+        {"_id": league_id}, {"$set": fields}
+    )
+    if not result.matched_count:
+        raise HTTPException(status_code=404, detail="League not found")
+
+
+async def save_draft_pick(league: League, player_name: str, team_index: int):
+    """
+    Save only the parts of the league that a draft pick changed, instead of the whole league
+    """
+    players = league.players
+    player_index = players._name_index[player_name]
+    player = players.players[player_index]
+    fields = {
+        f"players.players.{player_index}.drafted": True,
+        f"teams.{team_index}": league.teams[team_index].model_dump_doc(),
+        "current_draft_turn": league.current_draft_turn,
+    }
+
+    # The position lists are stored separately, so mark the player there too
+    for position_index, position_player in enumerate(
+        getattr(players, player.position, [])
+    ):
+        if position_player is player:
+            fields[f"players.{player.position}.{position_index}.drafted"] = True
+            break
+    await engine.get_collection(League).update_one(
+        {"_id": league.id},
+        {
+            "$set": fields,
+            "$push": {"draft_results": league.draft_results[-1].model_dump_doc()},
+        },
+    )
+
+
 async def get_a_draft_by_id(draft_id: ObjectId) -> Draft:
     """
     Get a draft by its ID
@@ -105,64 +211,128 @@ async def get_a_draft_by_id(draft_id: ObjectId) -> Draft:
     return draft
 
 
+def read_csv_columns(
+    file: UploadFile, columns: List[str], optional_columns: List[str] = None
+) -> List[tuple]:
+    """
+    Read the rows of an uploaded CSV file as tuples of the requested columns
+    (optional columns that are missing are None), reading the file synchronously,
+    so routes should call it in the threadpool
+    """
+    optional_columns = optional_columns or []
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, [])
+        indices = []
+        for column in columns + optional_columns:
+            if column in header:
+                indices.append(header.index(column))
+            elif column in optional_columns:
+                indices.append(None)
+            else:
+                raise HTTPException(
+                    status_code=400, detail=f"CSV file is missing the {column} column"
+                )
+        rows = []
+        for row in reader:
+            if not row:
+                continue  # Skip blank lines
+            rows.append(
+                tuple(
+                    row[i] if i is not None and i < len(row) else None for i in indices
+                )
+            )
+        return rows
+    finally:
+        # Leave the uploaded file open for FastAPI to close
+        text.detach()
+
+
 def create_max_points(
-    players: Players, draft_year: str = str(DRAFT_YEAR)
+    players: Players, draft_year: str = DRAFT_YEAR_KEY
 ) -> PositionMaxPoints:
     """
     Use the top player in each position to set max points
     (so that any outliers are not too extreme)
     """
-    max_points = {}
-    for position in ["qb", "rb", "wr", "te", "dst", "k"]:
-        max_points[position] = max(
-            [
-                player.points[draft_year].projected_points
-                for player in players.__getattribute__(position)
-            ]
-        )
+    max_points = dict.fromkeys(["qb", "rb", "wr", "te", "dst", "k"], 0.0)
+    for player in players.players:
+        projected_points = player.points[draft_year].projected_points
+        if (
+            player.position in max_points
+            and projected_points > max_points[player.position]
+        ):
+            max_points[player.position] = projected_points
     return PositionMaxPoints(**max_points)
 
 
 def create_historical_distributions(
-    players: Players, draft_year: str = str(DRAFT_YEAR)
+    players: Players, draft_year: str = DRAFT_YEAR_KEY
 ) -> PositionTierDistributions:
     """
     Use the difference between historical performance and projections
     to create distributions for each position tier
     (replicating injuries, breakouts, and busts from the past)
     """
-    distributions = {}
-    for player in players.players:
-
-        # Append or create the list for the position tier
-        if player.position_tier not in distributions:
-            distributions[player.position_tier] = []
-
-        # For each year available in the player's points, get the percentage adjustment
-        for year, points in player.points.items():
-            if points.actual_points and int(year) < int(
-                draft_year
-            ):  # Only use historical data
-                distributions[player.position_tier].append(
-                    (points.actual_points - points.projected_points)
-                    / points.projected_points
-                )
+    # Collect the tier, year, actual points, and projected points for every season
+    tier_names = list(dict.fromkeys(player.position_tier for player in players.players))
+    tier_ids = {tier: i for i, tier in enumerate(tier_names)}
+    seasons = np.array(
+        [
+            (
+                tier_ids[player.position_tier],
+                int(year),
+                points.actual_points or 0.0,  # Missing actual points are filtered out
+                points.projected_points,
+            )
+            for player in players.players
+            for year, points in player.points.items()
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 4)
+
+    # Only use historical seasons with actual points
+    # (and with projected points, since the adjustment is relative to them)
+    seasons = seasons[
+        (seasons[:, 2] != 0) & (seasons[:, 1] < int(draft_year)) & (seasons[:, 3] != 0)
+    ]
+    tiers = seasons[:, 0].astype(np.int32)
+    actual = seasons[:, 2]
+    projected = seasons[:, 3]
+
+    # Get the percentage adjustments at once, then group them by position tier
+    adjustments = (actual - projected) / projected
+    order = np.argsort(tiers, kind="stable")
+    tiers_sorted = tiers[order]
+    adjustments_sorted = adjustments[order]
+    boundaries = np.searchsorted(tiers_sorted, np.arange(len(tier_names) + 1))
+    distributions = {
+        tier: adjustments_sorted[boundaries[i] : boundaries[i + 1]].tolist()
+        for i, tier in enumerate(tier_names)
+    }
 
     # Return the position tier distributions
     return PositionTierDistributions(**distributions)
 
 
-def fit_logistic_regression_model(
-    logistic_regression_variables: LogisticRegressionVariables,
-) -> RegressorMixin:
+@lru_cache(maxsize=8)
+def fit_cached_logistic_regression_model(
+    x: tuple, y: tuple, num_picks: int
+) -> SoftmaxRegression:
     """
-    Train the model for simulating opponent draft picks
+    Train the model on hashable copies of the variables, so leagues with the same
+    historical draft data reuse the trained model (which must not be modified)
     """
     try:
-        draft_pick_model = LogisticRegression(max_iter=1000)
-        x = [[int(x)] for x in logistic_regression_variables.x]
-        y = logistic_regression_variables.y
-        draft_pick_model.fit(x, y)
+        draft_pick_model = SoftmaxRegression()
+        draft_pick_model.fit(
+            np.fromiter(map(int, x), dtype=np.int32, count=len(x)).reshape(-1, 1),
+            np.asarray(y),
+        )
+        draft_pick_model.proba_table_ = draft_pick_model.predict_proba(
+            np.arange(num_picks + 1).reshape(-1, 1)
+        ).astype(np.float32)
     except:
         raise HTTPException(
             status_code=500, detail="Failed to train logistic regression model"
@@ -170,46 +340,43 @@ def fit_logistic_regression_model(
     return draft_pick_model
 
 
+def fit_logistic_regression_model(
+    logistic_regression_variables: LogisticRegressionVariables,
+    num_picks: int,
+) -> SoftmaxRegression:
+    """
+    Train the model for simulating opponent draft picks (or restore it, if it was stored
+    with the variables), and attach its probabilities for every pick number in the draft
+    so they are predicted in a single batch
+    """
+    if not logistic_regression_variables.coefficients:
+        return fit_cached_logistic_regression_model(
+            tuple(logistic_regression_variables.x),
+            tuple(logistic_regression_variables.y),
+            num_picks,
+        )
+    draft_pick_model = SoftmaxRegression()
+    draft_pick_model.classes_ = np.array(logistic_regression_variables.classes)
+    draft_pick_model.coef_ = np.array(logistic_regression_variables.coefficients)
+    draft_pick_model.intercept_ = np.array(logistic_regression_variables.intercepts)
+    draft_pick_model.proba_table_ = draft_pick_model.predict_proba(
+        np.arange(num_picks + 1).reshape(-1, 1)
+    ).astype(np.float32)
+    return draft_pick_model
+
+
 def simulate_pick(
     league: League,
-    draft_pick_model: RegressorMixin,
+    draft_pick_model: SoftmaxRegression,
 ) -> str:
     """
     Simulate a pick using the logistic model to get probabilities for each position
     """
-    players = league.players
-
-    # Calculate the weights
-    team_index = league.draft_order[0]
-    team = league.teams[team_index]
-    weights = team.draft_turn_position_weights(
-        league.current_draft_turn + 1, draft_pick_model
-    )
-    weights = {k.lower(): v for k, v in weights.items()}
-
-    # Randomly choose which position to pick, based on the weights
-    positions = list(weights.keys())
-    weights = list(weights.values())
-    position_players = []
-    while len(position_players) == 0:
-        selection = random.choices(positions, weights=weights)[0]
-        position_players = [
-            x for x in getattr(players, selection) if x.drafted == False
-        ]
-
-        # If there are no players left in that position, remove it from the list
-        if len(position_players) == 0:
-            weights.remove(weights[positions.index(selection)])
-            positions.remove(selection)
-
-            # If the total weights are zero, reset them and just go random
-            # (this can happen at the end of the draft)
-            if sum(weights) == 0:
-                weights = [1 for _ in positions]
-
-    # Draft the best draftable player within that position
-    player = position_players[0]
-    return player.name
+    weights_table, class_mask = build_weights_table(draft_pick_model)
+    index = simulate_next_pick(league, weights_table, class_mask)
+    if index < 0:
+        raise HTTPException(status_code=400, detail="No players left to draft")
+    return league.players.players[index].name
 
 
 def draft_player(player_name: str, league: League):
@@ -217,91 +384,73 @@ def draft_player(player_name: str, league: League):
     Draft a player by name and update the league and players
     """
     players = league.players
-    player = [player for player in players.players if player.name == player_name]
-    if not player:
+    if player_name not in players._name_index:
         raise HTTPException(status_code=404, detail="Player not found")
-    else:
-        player = player[0]
+    player_index = players._name_index[player_name]
+    player = players.players[player_index]
+    if player.drafted:
+        raise HTTPException(status_code=400, detail="Player has already been drafted")
 
     # Set the player as drafted within the league
-    position = player.position.lower()
-    for k in ["players", position]:
-        if hasattr(players, k):
-            position_players = getattr(players, k)
-            # Find the player in the list by name
-            player_index = next(
-                (
-                    index
-                    for index, player in enumerate(position_players)
-                    if player.name == player_name
-                ),
-                None,
-            )
-            new_player = Player(**position_players[player_index].model_dump())
-            new_player.drafted = True
-            position_players[player_index] = new_player
+    # (the position lists share the same Player objects, so this updates both)
+    player.drafted = True
 
     # Draft the player
     league.add_player_to_current_draft_turn_team(player)
     return
 
 
-def simulate_draft(league: League, draft_pick_model: RegressorMixin):
-    """
-    Simulate an entire draft using the logistic model
-    """
-    draft_order = league.draft_order.copy()
-    for _ in enumerate(draft_order):
-        player_name = simulate_pick(league, draft_pick_model)
-        draft_player(player_name, league)
-    return
-
-
-def monte_carlo_draft(
+async def monte_carlo_draft(
     league: League,
-    seconds: float = 30,  # Set to whatever time is best for the draft
+    seconds: float = MONTE_CARLO_SECONDS,  # Upper limit, if the averages never converge
+    tolerance: float = MONTE_CARLO_TOLERANCE,
 ) -> MonteCarloSimulationResult:
     """
     Simulate drafts for each position and return the average points scored
     to determine which position is best to draft
     """
-    simulator_team = [i for i, team in enumerate(league.teams) if team.simulator]
+    if not any(team.simulator for team in league.teams):
+        raise HTTPException(status_code=404, detail="Simulator team not found")
     results = {"qb": [], "rb": [], "wr": [], "te": []}
     if league.current_draft_turn > ROUND_SIZE * 7:  # Add DST & K after round 7
         results["dst"] = []
         results["k"] = []
 
-    # Train the logistic regression model
-    draft_pick_model = fit_logistic_regression_model(
-        league.logistic_regression_variables
+    # Train the logistic regression model and get its weights for every remaining pick
+    draft_pick_model = await run_in_threadpool(
+        fit_logistic_regression_model,
+        league.logistic_regression_variables,
+        ROUND_SIZE * len(league.teams),
+    )
+    weights_table, class_mask = build_weights_table(draft_pick_model)
+    arrays = await run_in_threadpool(build_sim_arrays, league)
+
+    # Run the simulations across every worker process, without blocking the event loop
+    # (each worker gets the league's arrays rather than the whole league,
+    # and its tolerance is loosened so that the combined results meet the tolerance)
+    loop = asyncio.get_running_loop()
+    seeds = np.random.SeedSequence().spawn(MONTE_CARLO_WORKERS)
+    batches = await asyncio.gather(
+        *[
+            loop.run_in_executor(
+                app.state.process_pool,
+                run_trials,
+                arrays,
+                weights_table,
+                class_mask,
+                list(results.keys()),
+                seconds,
+                tolerance * math.sqrt(MONTE_CARLO_WORKERS),
+                seed,
+            )
+            for seed in seeds
+        ]
     )
-
-    # Begin the simulation
-    start_time = time.time()
     i = 0
-    while time.time() - start_time < seconds:
+    for batch_results, batch_iterations in batches:
         for position in results.keys():
-            possible_players = [
-                player
-                for player in league.players.__getattribute__(position)
-                if player.drafted == False
-            ]
-            if len(possible_players) == 0:
-                results[position].append(0)  # No players left
-                continue
-            best_player = possible_players[0]
-            league_copy = league.model_copy(deep=True)
-            draft_player(best_player.name, league_copy)
-            simulate_draft(league_copy, draft_pick_model)
-
-            # Append the points for the simulator team
-            results[position].append(
-                league_copy.teams[simulator_team[0]].randomized_starter_points(
-                    distributions=league.position_tier_distributions,
-                    max_points=league.position_max_points,
-                )
-            )
-            i += 1
+            results[position].extend(batch_results[position])
+        i += batch_iterations
 
     # Turn the arrays into averages
     for position in results.keys():
@@ -310,6 +459,58 @@ def monte_carlo_draft(
     return MonteCarloSimulationResult(**results)
 
 
+async def simulate_drafts(league: League, runs: int) -> SimulatedDraftResult:
+    """
+    Simulate the rest of the draft several times and return the players
+    most often drafted with each remaining pick
+    """
+    # Train the logistic regression model and get its weights for every remaining pick
+    draft_pick_model = await run_in_threadpool(
+        fit_logistic_regression_model,
+        league.logistic_regression_variables,
+        ROUND_SIZE * len(league.teams),
+    )
+    weights_table, class_mask = build_weights_table(draft_pick_model)
+    arrays = await run_in_threadpool(build_sim_arrays, league)
+
+    # Split the runs across every worker process, without blocking the event loop
+    loop = asyncio.get_running_loop()
+    workers = min(MONTE_CARLO_WORKERS, runs)
+    seeds = np.random.SeedSequence().spawn(workers)
+    batches = await asyncio.gather(
+        *[
+            loop.run_in_executor(
+                app.state.process_pool,
+                run_drafts,
+                arrays,
+                weights_table,
+                class_mask,
+                runs // workers + (w < runs % workers),
+                seed,
+            )
+            for w, seed in enumerate(seeds)
+        ]
+    )
+    counts = np.sum(batches, axis=0)
+
+    # Keep the most frequent players for each pick, as a share of the runs
+    picks = []
+    for k, team_index in enumerate(league.draft_order):
+        top = np.argsort(-counts[k], kind="stable")[:SIMULATED_DRAFT_PLAYERS]
+        picks.append(
+            SimulatedPick(
+                pick=league.current_draft_turn + k + 1,
+                team=league.teams[team_index].name,
+                players={
+                    league.players.players[j].name: round(counts[k, j] / runs, 4)
+                    for j in top
+                    if counts[k, j] > 0
+                },
+            )
+        )
+    return SimulatedDraftResult(runs=runs, picks=picks)
+
+
 # Routes
 @app.post("/league", response_model=League, tags=["league"])
 async def create_league(
@@ -329,17 +530,18 @@ async def create_league(
     """
     Read data from a POSTed CSV file and create a league
     """
-    data = csv.DictReader((await file.read()).decode("utf-8-sig").splitlines())
     teams = []
-    for row in data:
+    for team_name, order, owner, simulator in await run_in_threadpool(
+        read_csv_columns, file, ["Name", "Order", "Owner", "Simulator"]
+    ):
+        # Skip validation, because the CSV columns are already known
+        # (and a new team has no roster to fill starters from)
         teams.append(
-            Team(
-                name=row["Name"],
-                draft_order=row["Order"],
-                owner=row["Owner"],
-                simulator=row["Simulator"] == "True"
-                or row["Simulator"] == 1
-                or row["Simulator"] == "1",
+            Team.model_construct(
+                name=team_name,
+                draft_order=int(order),
+                owner=owner,
+                simulator=simulator in SIMULATOR_VALUES,
             )
         )
     league = League(
@@ -370,11 +572,44 @@ async def get_leagues(ready_for_draft: bool = True):
     """
     Get all leagues (default to only leagues that are ready for a draft)
     """
-    leagues = await engine.find(League)
+
+    # Filter and project in the database, so the players are never loaded
+    # (ready_for_draft is recomputed like the League validator does when loading,
+    # because a stored value is not updated when only the validator changes it)
+    def not_empty(field: str) -> dict:
+        return {"$gt": [{"$size": {"$ifNull": [field, []]}}, 0]}
+
+    pipeline = [
+        {"$match": {"copy_for_draft": False}},
+        {
+            "$project": {
+                "created": 1,
+                "name": 1,
+                "copy_for_draft": 1,
+                "ready_for_draft": {
+                    "$or": [
+                        {"$eq": ["$ready_for_draft", True]},
+                        {
+                            "$and": [
+                                not_empty("$teams"),
+                                not_empty("$players.players"),
+                                not_empty("$logistic_regression_variables.x"),
+                                not_empty("$logistic_regression_variables.y"),
+                                {"$eq": ["$ready_position_tier_distributions", True]},
+                                {"$eq": ["$ready_position_max_points", True]},
+                            ]
+                        },
+                    ]
+                },
+            }
+        },
+    ]
     if ready_for_draft:
-        leagues = [league for league in leagues if league.ready_for_draft]
-    leagues = [league for league in leagues if not league.copy_for_draft]
-    return leagues
+        pipeline.append({"$match": {"ready_for_draft": True}})
+    cursor = engine.get_collection(League).aggregate(pipeline)
+    return [
+        LeagueSimple(id=document.pop("_id"), **document) async for document in cursor
+    ]
 
 
 @app.get("/league/{league_id}", response_model=League, tags=["league"])
@@ -391,8 +626,9 @@ async def delete_league(league_id: ObjectId):
     """
     Delete a league by its ID
     """
-    league = await get_a_league_by_id(league_id)
-    await engine.delete(league)
+    result = await engine.get_collection(League).delete_one({"_id": league_id})
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="League not found")
     return Response(status_code=204)
 
 
@@ -417,10 +653,9 @@ async def create_draft_for_a_league(league_id: ObjectId):
     if not league.ready_for_draft:
         raise HTTPException(status_code=400, detail="League is not ready for a draft")
 
-    # Copy the league (without its ID) into a new object in the database
-    copied_data = league.model_dump()
-    copied_league = League(**{k: v for k, v in copied_data.items() if k != "id"})
-    copied_league.copy_for_draft = True
+    # Copy the league (with a new ID) into a new object in the database
+    # (a shallow copy is enough, because the original league is not saved again)
+    copied_league = league.model_copy(update={"id": ObjectId(), "copy_for_draft": True})
     await engine.save(copied_league)
 
     # Add the copied league to the draft
@@ -444,19 +679,32 @@ async def add_players_to_league(
         )
 
     # Read the CSV file and create players
-    data = csv.DictReader((await file.read()).decode("utf-8-sig").splitlines())
     players = []
-    for row in data:
+    for (
+        name,
+        position,
+        nfl_team,
+        season,
+        projected_points,
+        actual_points,
+    ) in await run_in_threadpool(
+        read_csv_columns,
+        file,
+        ["Player", "Pos", "Team", "Season", "Projected FFP"],
+        ["Actual FFP"],
+    ):
+        # Skip validation, because the CSV columns are already known
+        # (so lowercase the position and cast the points manually)
         players.append(
-            Player(
-                name=row["Player"],
-                position=row["Pos"],
-                nfl_team=row["Team"],
+            Player.construct_without_validation(
+                name=name,
+                position=position.lower(),
+                nfl_team=nfl_team,
                 drafted=False,
                 points={
-                    str(row["Season"]): PlayerPoints(
-                        projected_points=row["Projected FFP"],
-                        actual_points=row.get("Actual FFP", None),
+                    season: PlayerPoints.model_construct(
+                        projected_points=float(projected_points),
+                        actual_points=float(actual_points) if actual_points else None,
                     )
                 },
             )
@@ -477,14 +725,29 @@ async def get_players(league_id: ObjectId, draftable_only: bool = True):
     """
     Get all players in a league
     """
-    league = await get_a_league_by_id(league_id)
-    players = league.players
 
-    # Before returning the data, filter out drafted players if requested
+    # Only load the players, filtering out drafted players in the database if requested
     if draftable_only:
-        return Players(players=[player for player in players if not player.drafted])
+        players = {
+            key: {
+                "$filter": {
+                    "input": f"$players.{key}",
+                    "cond": {"$eq": ["$$this.drafted", False]},
+                }
+            }
+            for key in ["qb", "rb", "wr", "te", "dst", "k", "players"]
+        }
+        players["years"] = "$players.years"
+        players["ready_players"] = "$players.ready_players"
     else:
-        return players
+        players = "$players"
+    cursor = engine.get_collection(League).aggregate(
+        [{"$match": {"_id": league_id}}, {"$project": {"_id": 0, "players": players}}]
+    )
+    documents = await cursor.to_list(length=1)
+    if not documents:
+        raise HTTPException(status_code=404, detail="League not found")
+    return Players.model_validate_doc(documents[0]["players"])
 
 
 @app.delete("/league/{league_id}/player", tags=["player"])
@@ -492,9 +755,15 @@ async def delete_players_from_league(league_id: ObjectId):
     """
     Delete all players from a league
     """
-    league = await get_a_league_by_id(league_id)
-    league.players = Players()
-    await engine.save(league)
+    await set_league_fields_by_id(
+        league_id,
+        {
+            "players": Players().model_dump_doc(),
+            "position_max_points": PositionMaxPoints().model_dump_doc(),
+            "ready_position_max_points": False,
+            "ready_for_draft": False,
+        },
+    )
     return Response(status_code=204)
 
 
@@ -506,10 +775,10 @@ async def get_player(league_id: ObjectId, player_name: str):
     Get a player by their name
     """
     league = await get_a_league_by_id(league_id)
-    player = [player for player in league.players if player.name == player_name]
-    if not player:
+    players = league.players
+    if player_name not in players._name_index:
         raise HTTPException(status_code=404, detail="Player not found")
-    return player[0]
+    return players.players[players._name_index[player_name]]
 
 
 @app.post(
@@ -530,25 +799,40 @@ async def add_historical_player_data_to_league(
         )
 
     # Read the CSV file and create players
-    data = csv.DictReader((await file.read()).decode("utf-8-sig").splitlines())
     players = []
-    for row in data:
+    for (
+        name,
+        position,
+        nfl_team,
+        season,
+        projected_points,
+        actual_points,
+    ) in await run_in_threadpool(
+        read_csv_columns,
+        file,
+        ["Player", "Pos", "Team", "Season", "Projected FFP"],
+        ["Actual FFP"],
+    ):
+        # Skip validation, because the CSV columns are already known
+        # (so lowercase the position and cast the points manually)
         players.append(
-            Player(
-                name=row["Player"],
-                position=row["Pos"],
-                nfl_team=row["Team"],
+            Player.construct_without_validation(
+                name=name,
+                position=position.lower(),
+                nfl_team=nfl_team,
                 drafted=False,
                 points={
-                    str(row["Season"]): PlayerPoints(
-                        projected_points=row["Projected FFP"],
-                        actual_points=row.get("Actual FFP", None),
+                    season: PlayerPoints.model_construct(
+                        projected_points=float(projected_points),
+                        actual_points=float(actual_points) if actual_points else None,
                     )
                 },
             )
         )
-    league.position_tier_distributions = create_historical_distributions(
-        Players(players=players)
+
+    # Create the distributions in a thread, so other requests are not blocked
+    league.position_tier_distributions = await run_in_threadpool(
+        lambda: create_historical_distributions(Players(players=players))
     )
     league.ready_position_tier_distributions = True
     await engine.save(league)
@@ -576,9 +860,14 @@ async def delete_historical_player_data_from_league(league_id: ObjectId):
     """
     Delete all historical player data from a league
     """
-    league = await get_a_league_by_id(league_id)
-    league.position_tier_distributions = PositionTierDistributions()
-    await engine.save(league)
+    await set_league_fields_by_id(
+        league_id,
+        {
+            "position_tier_distributions": PositionTierDistributions().model_dump_doc(),
+            "ready_position_tier_distributions": False,
+            "ready_for_draft": False,
+        },
+    )
     return Response(status_code=204)
 
 
@@ -604,13 +893,28 @@ async def add_historical_draft_data_to_league(
         )
 
     # Read the CSV file and create logistic regression variables
-    data = csv.DictReader((await file.read()).decode("utf-8-sig").splitlines())
     x = []
     y = []
-    for row in data:
-        x.append(row["Pick"])
-        y.append(row["Pos"])
-    league.logistic_regression_variables = LogisticRegressionVariables(x=x, y=y)
+    for pick, position in await run_in_threadpool(
+        read_csv_columns, file, ["Pick", "Pos"]
+    ):
+        x.append(int(pick))
+        y.append(position)
+    logistic_regression_variables = LogisticRegressionVariables(x=x, y=y)
+
+    # Train the model once (in a thread, so other requests are not blocked)
+    # and store it with the variables
+    draft_pick_model = await run_in_threadpool(
+        fit_logistic_regression_model,
+        logistic_regression_variables,
+        ROUND_SIZE * len(league.teams),
+    )
+    logistic_regression_variables.classes = [
+        str(position) for position in draft_pick_model.classes_
+    ]
+    logistic_regression_variables.coefficients = draft_pick_model.coef_.tolist()
+    logistic_regression_variables.intercepts = draft_pick_model.intercept_.tolist()
+    league.logistic_regression_variables = logistic_regression_variables
     await engine.save(league)
     return league
 
@@ -636,9 +940,13 @@ async def delete_historical_draft_data_from_league(league_id: ObjectId):
     """
     Delete all historical draft data from a league
     """
-    league = await get_a_league_by_id(league_id)
-    league.logistic_regression_variables = LogisticRegressionVariables()
-    await engine.save(league)
+    await set_league_fields_by_id(
+        league_id,
+        {
+            "logistic_regression_variables": LogisticRegressionVariables().model_dump_doc(),
+            "ready_for_draft": False,
+        },
+    )
     return Response(status_code=204)
 
 
@@ -656,11 +964,15 @@ async def get_drafts():
     """
     Get all drafts from leagues that exist
     """
-    leagues = await engine.find(League)
-    drafts = []
-    for league in leagues:
-        drafts += await engine.find(Draft, Draft.league == league.id)
-    return drafts
+    # Project only the draft fields, so the leagues are never looked up and loaded
+    league_ids = await engine.get_collection(League).distinct("_id")
+    cursor = engine.get_collection(Draft).find(
+        {"league": {"$in": league_ids}},
+        {field: 1 for field in DraftSimple.model_fields if field != "id"},
+    )
+    return [
+        DraftSimple(id=document.pop("_id"), **document) async for document in cursor
+    ]
 
 
 @app.post("/draft/{draft_id}/pick", response_model=Draft, tags=["draft"])
@@ -681,25 +993,21 @@ async def make_draft_pick(
         )
 
     # If using the simulator, get a pick name
+    # (in a thread, so other requests are not blocked)
     if use_simulator:
-        draft_pick_model = fit_logistic_regression_model(
-            draft.league.logistic_regression_variables
+        draft_pick_model = await run_in_threadpool(
+            fit_logistic_regression_model,
+            draft.league.logistic_regression_variables,
+            ROUND_SIZE * len(draft.league.teams),
         )
-        name = simulate_pick(draft.league, draft_pick_model)
+        name = await run_in_threadpool(simulate_pick, draft.league, draft_pick_model)
 
-    # Find the player picked by name
-    players = draft.league.players.players
-    player = [player for player in players if player.name == name]
-    if not player:
-        raise HTTPException(status_code=404, detail="Player not found")
-    else:
-        player = player[0]
-
-    # Set the player as drafted within the league
+    # Set the player as drafted within the league (which finds the player by name)
+    team_index = draft.league.draft_order[0]
     draft_player(name, draft.league)
 
-    # Save the draft
-    await engine.save(draft)
+    # Save only the changes to the draft's league
+    await save_draft_pick(draft.league, name, team_index)
 
     # Return the draft after all operations have been performed
     return draft
@@ -716,7 +1024,24 @@ async def run_monte_carlo_simulation(draft_id: ObjectId):
     Run a Monte Carlo simulation to determine the best position to draft
     """
     draft = await get_a_draft_by_id(draft_id)
-    return monte_carlo_draft(draft.league)
+    return await monte_carlo_draft(draft.league)
+
+
+# Simulate the rest of a draft several times to see who is likely drafted with each pick
+@app.post(
+    "/draft/{draft_id}/simulate",
+    response_model=SimulatedDraftResult,
+    tags=["draft"],
+)
+async def run_draft_simulations(
+    draft_id: ObjectId, n_runs: int = Query(1000, ge=1, le=SIMULATED_DRAFT_MAX_RUNS)
+):
+    """
+    Simulate the rest of a draft several times and return the players
+    most often drafted with each remaining pick
+    """
+    draft = await get_a_draft_by_id(draft_id)
+    return await simulate_drafts(draft.league, n_runs)
 
 
 # Get the results of a draft by running each team's randomized points 1000x times
@@ -730,15 +1055,7 @@ async def get_draft_results(draft_id: ObjectId):
     Get the results of a draft by running each team's randomized points 1000x times
     """
     draft = await get_a_draft_by_id(draft_id)
-    results = {}
-    for team in draft.league.teams:
-        points = []
-        for _ in range(1000):
-            points.append(
-                team.randomized_starter_points(
-                    distributions=draft.league.position_tier_distributions,
-                    max_points=draft.league.position_max_points,
-                )
-            )
-        results[team.name] = round(sum(points) / len(points), 2)
-    return results
+
+    # Randomize with the compiled kernels, in a thread, so other requests are not blocked
+    results = await run_in_threadpool(randomized_team_points, draft.league, 1000)
+    return {name: round(points, 2) for name, points in results.items()}
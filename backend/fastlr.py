@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+MULTINOMIAL LOGISTIC REGRESSION FOR A SINGLE FEATURE
+"""
+from numba import njit
+import numpy as np
+
+
+@njit(cache=True)
+def newton_terms(values, counts, coef, intercept, alpha):
+    """
+    Return the penalized negative log likelihood, with its gradient and Hessian,
+    for a table of class counts at each feature value
+    (parameters are ordered as every coefficient, then every intercept)
+    """
+    num_values, num_classes = counts.shape
+    loss = 0.5 * alpha * np.sum(coef**2)
+    gradient = np.zeros(2 * num_classes)
+    hessian = np.zeros((2 * num_classes, 2 * num_classes))
+    probabilities = np.empty(num_classes)
+    for k in range(num_values):
+        total = counts[k].sum()
+        if total == 0:
+            continue
+
+        # Softmax of the logits (shifted by the max, so the exponents cannot overflow)
+        logits = coef * values[k] + intercept
+        shift = logits.max()
+        norm = 0.0
+        for c in range(num_classes):
+            probabilities[c] = np.exp(logits[c] - shift)
+            norm += probabilities[c]
+        probabilities /= norm
+        log_norm = shift + np.log(norm)
+
+        # Add this feature value's terms, weighted by its counts
+        for c in range(num_classes):
+            loss -= counts[k, c] * (logits[c] - log_norm)
+            residual = total * probabilities[c] - counts[k, c]
+            gradient[c] += residual * values[k]
+            gradient[num_classes + c] += residual
+            for d in range(num_classes):
+                weight = total * probabilities[c] * ((c == d) - probabilities[d])
+                hessian[c, d] += weight * values[k] * values[k]
+                hessian[c, num_classes + d] += weight * values[k]
+                hessian[num_classes + c, d] += weight * values[k]
+                hessian[num_classes + c, num_classes + d] += weight
+
+    # The L2 penalty only applies to the coefficients, not the intercepts
+    for c in range(num_classes):
+        gradient[c] += alpha * coef[c]
+        hessian[c, c] += alpha
+    return loss, gradient, hessian
+
+
+class SoftmaxRegression:
+    """
+    Multinomial logistic regression on one feature with an L2 penalty on the coefficients
+    (the same model as scikit-learn's LogisticRegression), fit with Newton's method
+    on the counts of each class at each feature value instead of on every sample
+    """
+
+    def __init__(self, C: float = 1.0, max_iter: int = 100, tol: float = 1e-8):
+        self.C = C
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def fit(self, X, y) -> "SoftmaxRegression":
+        """
+        Fit the coefficients and intercepts for each class
+        """
+        self.classes_, y_index = np.unique(np.asarray(y), return_inverse=True)
+        if len(self.classes_) < 2:
+            raise ValueError("At least two classes are needed to fit the model")
+        values, x_index = np.unique(
+            np.asarray(X, dtype=np.float64).reshape(-1), return_inverse=True
+        )
+        counts = np.zeros((len(values), len(self.classes_)))
+        np.add.at(counts, (x_index, y_index), 1)
+
+        # Minimize with Newton's method, backtracking if a step does not reduce the loss
+        # (the intercepts can shift together without changing the probabilities,
+        # so the steps are least squares solutions)
+        num_classes = len(self.classes_)
+        params = np.zeros(2 * num_classes)
+        loss, gradient, hessian = newton_terms(
+            values, counts, params[:num_classes], params[num_classes:], 1 / self.C
+        )
+        for _ in range(self.max_iter):
+            step = np.linalg.lstsq(hessian, -gradient, rcond=None)[0]
+            step_size = 1.0
+            while True:
+                new_params = params + step_size * step
+                new_terms = newton_terms(
+                    values,
+                    counts,
+                    new_params[:num_classes],
+                    new_params[num_classes:],
+                    1 / self.C,
+                )
+                if (
+                    new_terms[0] <= loss + 1e-4 * step_size * (gradient @ step)
+                    or step_size < 1e-10
+                ):
+                    break
+                step_size /= 2
+            params = new_params
+            loss, gradient, hessian = new_terms
+            if np.abs(gradient).max() <= self.tol * counts.sum():
+                break
+
+        self.coef_ = params[:num_classes].reshape(-1, 1)
+        self.intercept_ = params[num_classes:]
+        self.n_features_in_ = 1
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Return the probability of each class for each feature value
+        """
+        logits = (
+            np.asarray(X, dtype=np.float64).reshape(-1, 1) * self.coef_[:, 0]
+            + self.intercept_
+        )
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
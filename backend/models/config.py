@@ -29,5 +29,21 @@ MAX_RANDOM_ADJUSTMENT = float(os.getenv("MAX_RANDOM_ADJUSTMENT", 0.1))
 DRAFT_YEAR = int(
     os.getenv("DRAFT_YEAR", datetime.datetime.now().year)
 )  # Default current year
+DRAFT_YEAR_KEY = str(DRAFT_YEAR)  # Player points are keyed by the year as a string
 ROUND_SIZE = int(os.getenv("ROUND_SIZE", 14))
 SNAKE_DRAFT = os.getenv("SNAKE_DRAFT", "True").lower() == "true"
+
+# Monte Carlo settings
+MONTE_CARLO_SECONDS = float(os.getenv("MONTE_CARLO_SECONDS", 30))  # Time limit
+MONTE_CARLO_TOLERANCE = float(
+    os.getenv("MONTE_CARLO_TOLERANCE", 0.002)
+)  # Stop once the standard error is this fraction of the mean
+MONTE_CARLO_CHECK_INTERVAL = int(os.getenv("MONTE_CARLO_CHECK_INTERVAL", 50))
+
+# Simulated draft settings
+SIMULATED_DRAFT_PLAYERS = int(
+    os.getenv("SIMULATED_DRAFT_PLAYERS", 5)
+)  # Most frequent players returned for each pick
+SIMULATED_DRAFT_MAX_RUNS = int(
+    os.getenv("SIMULATED_DRAFT_MAX_RUNS", 10000)
+)  # Most simulated drafts allowed in one request
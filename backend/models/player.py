@@ -2,12 +2,12 @@
 """
 ODMANTIC MODELS FOR PLAYERS
 """
-from .config import DRAFT_YEAR, MAX_RANDOM_ADJUSTMENT
+from .config import DRAFT_YEAR_KEY, MAX_RANDOM_ADJUSTMENT
 from .position import PositionMaxPoints, PositionTierDistributions, PositionTiers
 from odmantic import EmbeddedModel, Model
 from pydantic import field_validator, model_validator
 import random
-from typing import Dict, List, Union
+from typing import Dict, List, NamedTuple, Union
 
 # Load the position tiers, determined by environment variables
 pt = PositionTiers()
@@ -43,6 +43,18 @@ class PlayerPointsRandomized(Model):
         return round(value, 2)
 
 
+class SampledPoints(NamedTuple):
+    """
+    A random projection of points for a player, without model validation,
+    for code that samples many projections and only needs the values
+    """
+
+    randomized_points: float  # Projected points are kept as is for DST & K
+    projected_points: float
+    adjustment: float = 0
+    exceeded_max: bool = False
+
+
 class Player(EmbeddedModel):
     """
     Store all player information, with an added method for
@@ -58,6 +70,16 @@ class Player(EmbeddedModel):
     points: Dict[str, PlayerPoints]  # Key is the year of the points
     drafted: bool = False
 
+    @classmethod
+    def construct_without_validation(cls, **values) -> "Player":
+        """
+        Create a player with model_construct, tracking the fields as modified
+        like ODMantic does when initialized, so the player can still be assigned to
+        """
+        player = cls.model_construct(**values)
+        object.__setattr__(player, "__fields_modified__", set(cls.__odm_fields__))
+        return player
+
     @field_validator("position", "position_tier")
     @classmethod
     def validate_position(cls, value) -> str:
@@ -72,46 +94,57 @@ class Player(EmbeddedModel):
         """
         self.drafted = True
 
-    def randomized_points(
+    def sample_points(
         self,
         distributions: PositionTierDistributions = PositionTierDistributions(),
         max_points: PositionMaxPoints = PositionMaxPoints(),
         max_points_adjustment: float = MAX_RANDOM_ADJUSTMENT,
-        year: str = str(DRAFT_YEAR),
-    ) -> PlayerPointsRandomized:
+        year: str = DRAFT_YEAR_KEY,
+    ) -> SampledPoints:
         """
         Return a random point projection for the player, if a distribution exists
         """
-        output = {"projected_points": self.points[str(year)].projected_points}
+        projected_points = self.points[str(year)].projected_points
 
         # If the tier distribution is not available (DST & K), return the projected points
-        tier_distribution = distributions.model_dump().get(self.position_tier, None)
+        # (read as attributes, rather than dumping every distribution for each player)
+        tier_distribution = getattr(distributions, self.position_tier or "", None)
         if not tier_distribution:
-            output["randomized_points"] = output["projected_points"]
+            return SampledPoints(projected_points, projected_points)
 
         # Randomly selection an adjustment from the distribution and apply it
-        else:
-            output["adjustment"] = random.choice(tier_distribution)
-            output["randomized_points"] = round(
-                self.points[str(year)].projected_points * (1.0 + output["adjustment"])
-            )
-
-            # If the adjustment exceeds the max points, return the max points
-            max_allowed = int(
-                max_points.model_dump()[self.position.lower()]
-                * (1 + max_points_adjustment)
-            )
-            if output["randomized_points"] > max_allowed:
-                output["randomized_points"] = max_allowed
-                output["exceeded_max"] = True
-
-            # If the adjustment is somehow negative, return zero points
-            # Zero points simulates an early season-ending injury (like 2023 Aaron Rodgers)
-            elif output["randomized_points"] < 0:
-                output["randomized_points"] = 0
-
-        # Return the output as a PlayerPointsRandomized object
-        return PlayerPointsRandomized(**output)
+        adjustment = random.choice(tier_distribution)
+        randomized_points = round(projected_points * (1.0 + adjustment))
+
+        # Clamp the points between zero and the max points
+        # If the adjustment exceeds the max points, return the max points
+        # If the adjustment is somehow negative, return zero points
+        # Zero points simulates an early season-ending injury (like 2023 Aaron Rodgers)
+        max_allowed = int(
+            getattr(max_points, self.position) * (1 + max_points_adjustment)
+        )
+        return SampledPoints(
+            min(max(randomized_points, 0), max_allowed),
+            projected_points,
+            adjustment,
+            randomized_points > max_allowed,
+        )
+
+    def randomized_points(
+        self,
+        distributions: PositionTierDistributions = PositionTierDistributions(),
+        max_points: PositionMaxPoints = PositionMaxPoints(),
+        max_points_adjustment: float = MAX_RANDOM_ADJUSTMENT,
+        year: str = DRAFT_YEAR_KEY,
+    ) -> PlayerPointsRandomized:
+        """
+        Return a random point projection for the player as a PlayerPointsRandomized object
+        """
+        return PlayerPointsRandomized(
+            **self.sample_points(
+                distributions, max_points, max_points_adjustment, year
+            )._asdict()
+        )
 
 
 class Players(EmbeddedModel):
@@ -130,16 +163,50 @@ class Players(EmbeddedModel):
     years: List[str] = []
     ready_players: bool = False
 
+    def model_post_init(self, __context):
+        """
+        Index the players by name after they are loaded, for constant-time lookups
+        (set directly on the instance, because ODMantic models cannot have private attributes)
+        """
+        name_index = {}
+        for i, player in enumerate(self.players):
+            name_index.setdefault(player.name, i)
+        object.__setattr__(self, "_name_index", name_index)
+
     @model_validator(mode="before")
     def assign_players_to_positions(cls, data):
         """
         Assign the player to the correct position and position tiers
         """
+        positions = ["qb", "rb", "wr", "te", "dst", "k"]
         if "ready_players" in data and data["ready_players"]:
+            # Point the position lists at the same Player objects as the players list
+            # (stored separately, so they are loaded as copies),
+            # so drafting a player only has to update one object
+            if "players" in data:
+                data["players"] = [
+                    player if isinstance(player, Player) else Player(**player)
+                    for player in data["players"]
+                ]
+                by_name = {}
+                for player in data["players"]:
+                    by_name.setdefault(player.name, player)
+                for position in positions:
+                    if position in data:
+                        data[position] = [
+                            by_name.get(
+                                (
+                                    player["name"]
+                                    if isinstance(player, dict)
+                                    else player.name
+                                ),
+                                player,
+                            )
+                            for player in data[position]
+                        ]
             return data
 
         # Ensure all players are Player objects
-        positions = ["qb", "rb", "wr", "te", "dst", "k"]
         positions_and_players = positions + ["players"]
         for key in positions_and_players:
             if key in data and not all(
@@ -159,27 +226,31 @@ class Players(EmbeddedModel):
                     data[player.position] = [player]
             data["years"] = sorted(list(years))
 
-        # For each position, order the players by projected points
-        # if the list is for the current draft
-        for year in data["years"]:
+        # For each position, order the players by projected points, latest year first
+        # (sorted once, with earlier years breaking ties, instead of resorting per year)
+        if data["years"]:
             for position_order in positions:
                 if position_order in data:
                     data[position_order] = sorted(
                         data[position_order],
-                        key=lambda x: x.points[year].projected_points,
+                        key=lambda x: tuple(
+                            x.points[year].projected_points
+                            for year in reversed(data["years"])
+                        ),
                         reverse=True,
                     )
 
             # For each position tier, assign players to their tier
+            tiers = pt.model_dump()
             for position_tier in positions:
-                if position_tier not in pt.model_dump():
+                if position_tier not in tiers:
                     if position_tier in data:  # DST & K do not have tiers
                         for player in data[position_tier]:
                             player.position_tier = player.position
 
                 # If the index is within the tier, assign the tier
                 else:
-                    tier = pt.model_dump()[position_tier]
+                    tier = tiers[position_tier]
                     if position_tier in data:
                         for i, player in enumerate(data[position_tier]):
                             if i < tier["1"]:
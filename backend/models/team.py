@@ -2,72 +2,100 @@
 """
 ODMANTIC MODELS FOR TEAMS
 """
-from .config import DRAFT_YEAR, ROUND_SIZE, SNAKE_DRAFT
-import copy
+from .config import DRAFT_YEAR, DRAFT_YEAR_KEY, ROUND_SIZE, SNAKE_DRAFT
 import datetime
+from functools import lru_cache
+import heapq
 from .player import Player, Players
 from .position import PositionMaxPoints, PositionSizes, PositionTierDistributions
-from odmantic import EmbeddedModel, Model, ObjectId, Reference
+from odmantic import EmbeddedModel, Index, Model, ObjectId, Reference
 from pydantic import BaseModel, ConfigDict, model_validator
-from sklearn.base import RegressorMixin
-from typing import List
+from typing import Dict, List
 
 
 # Load the position sizes, determined by environment variables
+# (dumped once, since they never change while the app runs)
 ps = PositionSizes()
+POSITION_SIZES = ps.model_dump()
+FLEX_POSITIONS = ("rb", "wr", "te")
+
+# Team lists that are filled from the roster
+STARTER_LISTS = ("qb", "rb", "wr", "te", "flex", "dst", "k", "starters")
 
 
 """
-TEAM HELPER FUNCTION
+TEAM HELPER FUNCTIONS
 """
 
 
-def fill_starters(roster):
+def starter_indices(roster: List[Player], points: List[float]) -> dict:
     """
-    Use projected points to fill the roster with the best players
-    (used twice within the Team model, so it's a helper function)
+    Use the points to find the roster indices of the best players at each position,
+    then flex and all starters
     """
-    not_flex = []
+    not_flex = set()
     output = {}
 
     # Perform the iteration for each position
-    for position, size in ps.model_dump().items():
-        players = [player for player in roster if player["position"] == position]
-        if players:
-
-            # Sort by projected points and take the top players
-            output[position] = sorted(
-                players,
-                key=lambda x: x["points"][str(DRAFT_YEAR)]["projected_points"],
-                reverse=True,
-            )[:size]
+    # (selecting the top few with a heap, which ranks ties the same as a stable sort)
+    for position, size in POSITION_SIZES.items():
+        best = heapq.nlargest(
+            size,
+            (i for i, player in enumerate(roster) if player.position == position),
+            key=points.__getitem__,
+        )
+        if best:
+            output[position] = best
 
-            # Add those players to the not_flex list
-            not_flex.extend(output[position])
+            # Add those players to the not_flex set
+            not_flex.update(best)
 
     # Take the best remaining RB, WR, or TE for flex
-    flex_players = [
-        player
-        for player in roster
-        if player["position"] in ["rb", "wr", "te"] and player not in not_flex
-    ]
-    output["flex"] = sorted(
-        flex_players,
-        key=lambda x: x["points"][str(DRAFT_YEAR)]["projected_points"],
-        reverse=True,
-    )[: ps.flex]
+    output["flex"] = heapq.nlargest(
+        ps.flex,
+        (
+            i
+            for i, player in enumerate(roster)
+            if player.position in FLEX_POSITIONS and i not in not_flex
+        ),
+        key=points.__getitem__,
+    )
 
     # Combine all positions for starters
-    positions = ps.model_dump().keys() | {"flex"}
     output["starters"] = [
-        player
-        for position in positions
-        if position in output
-        for player in output[position]
+        i for position in POSITION_SIZES if position in output for i in output[position]
     ]
     return output
 
 
+def fill_starters(roster: List[Player]) -> dict:
+    """
+    Use projected points to fill the roster with the best players
+    (used twice within the Team model, so it's a helper function)
+    """
+    points = [player.points[DRAFT_YEAR_KEY].projected_points for player in roster]
+    return {
+        position: [roster[i] for i in indices]
+        for position, indices in starter_indices(roster, points).items()
+    }
+
+
+@lru_cache(maxsize=None)
+def full_draft_order(num_teams: int, snake_draft: bool) -> tuple:
+    """
+    Return the team indices for every pick of the draft, in order
+    (cached, since it only depends on the number of teams and the draft type)
+    """
+    team_indices = tuple(range(num_teams))
+    draft_order = ()
+    for i in range(ROUND_SIZE):
+        if snake_draft and i % 2 == 1:
+            draft_order += team_indices[::-1]
+        else:
+            draft_order += team_indices
+    return draft_order
+
+
 """
 MODELS
 """
@@ -110,52 +138,33 @@ class Team(EmbeddedModel):
         """
         if "roster" not in data or not data["roster"]:
             return data  # If roster is not in data, just return the data - there's nothing to do
+
+        # Load the roster as Player objects, so the positions share them with the roster
+        data["roster"] = [
+            player if isinstance(player, Player) else Player(**player)
+            for player in data["roster"]
+        ]
         starters = fill_starters(data["roster"])
         for position, players in starters.items():
             data[position] = players
         data["starters"] = starters.get("starters", [])
         return data
 
-    def draft_turn_position_weights(
-        self, pick_number: int, model: RegressorMixin
-    ) -> dict:
+    def refill_starters(self):
         """
-        Use the starting line-up to determine the weight each
-        position should have when randomly selecting a player
+        Refill the starters from the roster in place, without validating the team again
+        (assigning the lists would rerun the validators, so their contents are replaced)
         """
-        position_weights = {}
-        probabilities = model.predict_proba([[pick_number]])[0]
-        for i, position in enumerate(model.classes_):
-            position_weights[position] = probabilities[i]
-
-        # For each position, check if the starters are filled
-        starting_positions = ["qb", "rb", "wr", "te", "dst", "k"]
-        starting_filled = 0
-        for position in starting_positions:
-            if len(getattr(self, position)) == ps.model_dump()[position]:
-                starting_filled += 1
-
-        # If all of the important positions are filled, return the position weights
-        if starting_filled == len(starting_positions):
-            return position_weights
-
-        # Otherwise, adjust the weights based on the number of important positions filled
-        for position in starting_positions:
-            if len(getattr(self, position)) == ps.model_dump()[position]:
-                position_weights[position] = 0
-
-        # Recalculate the total weight and return the position weights
-        total_weight = sum(position_weights.values())
-        return {
-            position: weight / total_weight
-            for position, weight in position_weights.items()
-        }
+        starters = fill_starters(self.roster)
+        for field in STARTER_LISTS:
+            getattr(self, field)[:] = starters.get(field, [])
 
     def projected_roster_points(self, year: int = DRAFT_YEAR) -> int:
         """
         Calculate the total projected points for the whole roster, not just the starters,
         using the draft year as the default year
         """
+        year = str(year)
         return sum([player.points[year].projected_points for player in self.roster])
 
     def projected_starter_points(self, year: int = DRAFT_YEAR) -> int:
@@ -163,52 +172,9 @@ class Team(EmbeddedModel):
         Calculate the total projected points for the starters only,
         using the draft year as the default year
         """
+        year = str(year)
         return sum([player.points[year].projected_points for player in self.starters])
 
-    def randomized_roster_points(
-        self,
-        distributions: PositionTierDistributions = PositionTierDistributions(),
-        max_points: PositionMaxPoints = PositionMaxPoints(),
-        year: int = DRAFT_YEAR,
-    ) -> int:
-        """
-        Calculate the total randomized points for the whole roster, not just the starters,
-        using the draft year as the default year
-        """
-        return sum(
-            [
-                player.randomized_points(
-                    distributions=distributions, max_points=max_points, year=year
-                ).randomized_points
-                for player in self.roster
-            ]
-        )
-
-    def randomized_starter_points(
-        self,
-        distributions: PositionTierDistributions = PositionTierDistributions(),
-        max_points: PositionMaxPoints = PositionMaxPoints(),
-        year: int = DRAFT_YEAR,
-    ) -> int:
-        """
-        Calculate the total randomized points for the starters only,
-        using the draft year as the default year
-        """
-        roster_copy = copy.deepcopy(self.roster)
-        for i, player in enumerate(roster_copy):
-            player_data = player.model_dump()
-            player_data["points"][str(year)]["projected_points"] = (
-                player.randomized_points(
-                    distributions=distributions, max_points=max_points, year=year
-                ).randomized_points
-            )
-            new_player = Player(**player_data)
-            roster_copy[i] = new_player
-        starters = fill_starters([x.model_dump() for x in roster_copy])["starters"]
-        return sum(
-            [player["points"][str(year)]["projected_points"] for player in starters]
-        )
-
 
 class LogisticRegressionVariables(EmbeddedModel):
     """
@@ -218,6 +184,11 @@ class LogisticRegressionVariables(EmbeddedModel):
     x: List[int] = []
     y: List[str] = []
 
+    # Trained model, so it does not need to be trained again when the league is loaded
+    classes: List[str] = []
+    coefficients: List[List[float]] = []
+    intercepts: List[float] = []
+
 
 class LeagueSimple(BaseModel):
     """
@@ -237,6 +208,9 @@ class League(Model):
     All teams in the league, with draft order, based on settings
     """
 
+    # Index whether a league is a copy, which is how leagues are listed
+    model_config = {"indexes": lambda: [Index(League.copy_for_draft)]}
+
     created: datetime.datetime = datetime.datetime.now()
     name: str = ""
     roster_size: int = 14
@@ -283,21 +257,10 @@ class League(Model):
         # Sort the teams
         data["teams"] = sorted(data["teams"], key=lambda x: x.draft_order)
 
-        # For the number of rounds, create the draft order as a list
-        data["draft_order"] = []
-        team_indices = [data["teams"].index(team) for team in data["teams"]]
-        for i in range(ROUND_SIZE):
-            if data["snake_draft"]:
-                if i % 2 == 0:
-                    data["draft_order"].extend(team_indices)
-                else:
-                    data["draft_order"].extend(team_indices[::-1])
-            else:
-                data["draft_order"].extend(team_indices)
-
-        # For whichever current_draft_turn we are on, pop the first team from the draft order
-        for _ in range(data["current_draft_turn"]):
-            data["draft_order"].pop(0)
+        # For the number of rounds, create the draft order as a list,
+        # skipping the turns that have already been drafted
+        draft_order = full_draft_order(len(data["teams"]), data["snake_draft"])
+        data["draft_order"] = list(draft_order[data["current_draft_turn"] :])
 
         # Check if we are ready to draft
         if (
@@ -318,14 +281,6 @@ class League(Model):
         # Return the data to populate the model
         return data
 
-    def rank_by_projected_team_points(self) -> list:
-        """
-        Return a sorted list of the teams by projected points
-        """
-        return sorted(
-            self.teams, key=lambda x: x.projected_roster_points(), reverse=True
-        )
-
     def add_player_to_current_draft_turn_team(self, player: Player) -> Team:
         """
         Draft a player and return the team that drafted the player
@@ -333,13 +288,20 @@ class League(Model):
         team_index = self.draft_order[0]
         team = self.teams[team_index]
 
-        # Append the player to the team's roster
+        # Append the player to the team's roster and update its starters in place
         team.roster.append(player)
-
-        # Reinitialize team, appended to draft_results, with the new player on the roster
-        team_dict = team.model_dump()
-        self.teams[team_index] = Team(**team_dict)
-        self.draft_results.append(Team(**team_dict))
+        team.refill_starters()
+
+        # Append a copy of the team to draft_results (copying only the lists,
+        # since the players are shared and the team's lists keep changing)
+        self.draft_results.append(
+            team.model_copy(
+                update={
+                    field: list(getattr(team, field))
+                    for field in ("roster",) + STARTER_LISTS
+                }
+            )
+        )
 
         # Increment the current draft turn
         self.current_draft_turn += 1
@@ -362,6 +324,9 @@ class Draft(Model):
     and a created date
     """
 
+    # Index the league, which is how drafts are listed
+    model_config = {"indexes": lambda: [Index(Draft.league)]}
+
     league: League = Reference()
     created: datetime.datetime = datetime.datetime.now()
 
@@ -378,3 +343,23 @@ class MonteCarloSimulationResult(BaseModel):
     dst: float = 0
     k: float = 0
     iterations: int = 0
+
+
+class SimulatedPick(BaseModel):
+    """
+    Pydantic model for one pick of the simulated drafts, with the share of drafts
+    in which each of the most frequent players was drafted
+    """
+
+    pick: int
+    team: str
+    players: Dict[str, float] = {}
+
+
+class SimulatedDraftResult(BaseModel):
+    """
+    Pydantic model for the simulated draft results
+    """
+
+    runs: int
+    picks: List[SimulatedPick] = []
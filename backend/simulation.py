@@ -0,0 +1,671 @@
+# -*- coding: utf-8 -*-
+"""
+NUMBA KERNELS FOR THE MONTE CARLO DRAFT SIMULATION
+"""
+from dataclasses import dataclass
+from numba import njit
+import math
+import numpy as np
+import time
+
+from fastlr import SoftmaxRegression
+from models.config import (
+    DRAFT_YEAR_KEY,
+    MAX_RANDOM_ADJUSTMENT,
+    MONTE_CARLO_CHECK_INTERVAL,
+)
+from models.position import PositionSizes, PositionTierDistributions
+from models.team import League
+
+# Position order used by every array in the simulation
+POSITIONS = ("qb", "rb", "wr", "te", "dst", "k")
+POSITION_IDS = {position: i for i, position in enumerate(POSITIONS)}
+FLEX_POSITIONS = ("rb", "wr", "te")
+
+# Tier order used by the distributions array
+TIERS = tuple(PositionTierDistributions.model_fields.keys())
+TIER_IDS = {tier: i for i, tier in enumerate(TIERS)}
+
+# Number of trials between checks of the clock
+DEADLINE_CHECK_INTERVAL = 32
+
+# Load the position sizes, determined by environment variables
+ps = PositionSizes()
+
+
+"""
+ARRAY HELPER FUNCTIONS
+"""
+
+
+def build_weights_table(draft_pick_model: SoftmaxRegression) -> tuple:
+    """
+    Reorder the model's probabilities for every pick number into the simulation's
+    positions, along with a mask of the positions the model can pick
+    """
+    probabilities = draft_pick_model.proba_table_
+    weights_table = np.zeros((probabilities.shape[0], len(POSITIONS)), dtype=np.float32)
+    class_mask = np.zeros(len(POSITIONS), dtype=np.bool_)
+    for c, position in enumerate(draft_pick_model.classes_):
+        position = str(position).lower()
+        if position in POSITION_IDS:
+            weights_table[:, POSITION_IDS[position]] = probabilities[:, c]
+            class_mask[POSITION_IDS[position]] = True
+    return weights_table, class_mask
+
+
+def build_sim_arrays(league: League) -> dict:
+    """
+    Convert the league into a structure of NumPy arrays, once per simulation,
+    so that the drafts themselves never touch the Pydantic models
+    """
+    players = league.players.players
+    name_index = league.players._name_index
+
+    # Player-level arrays (indexed the same as league.players.players)
+    drafted = np.array([player.drafted for player in players], dtype=np.bool_)
+    position_id = np.array(
+        [POSITION_IDS.get(player.position, -1) for player in players], dtype=np.int8
+    )
+
+    # Player indices for each position, already sorted by projected points
+    position_counts = np.zeros(len(POSITIONS), dtype=np.int32)
+    position_lists = []
+    for p, position in enumerate(POSITIONS):
+        position_lists.append(
+            [name_index[player.name] for player in getattr(league.players, position)]
+        )
+        position_counts[p] = len(position_lists[-1])
+    position_order = np.full(
+        (len(POSITIONS), max(1, position_counts.max())), -1, dtype=np.int32
+    )
+    for p, indices in enumerate(position_lists):
+        position_order[p, : len(indices)] = indices
+
+    # Point each position at its best undrafted player
+    heads = np.zeros(len(POSITIONS), dtype=np.int32)
+    for p in range(len(POSITIONS)):
+        best_available(drafted, position_order, position_counts, heads, p)
+
+    # Count the players at each position on each team's roster
+    team_counts = np.zeros((len(league.teams), len(POSITIONS)), dtype=np.int32)
+    for t, team in enumerate(league.teams):
+        for player in team.roster:
+            if player.position in POSITION_IDS:
+                team_counts[t, POSITION_IDS[player.position]] += 1
+    starter_sizes = np.array(
+        [getattr(ps, position) for position in POSITIONS], dtype=np.int32
+    )
+    flex_mask = np.array(
+        [position in FLEX_POSITIONS for position in POSITIONS], dtype=np.bool_
+    )
+
+    # The simulator team (or -1 if there is none) and the players already on its roster
+    simulator_team = next(
+        (t for t, team in enumerate(league.teams) if team.simulator), -1
+    )
+    simulator_roster = np.array(
+        (
+            [name_index[player.name] for player in league.teams[simulator_team].roster]
+            if simulator_team >= 0
+            else []
+        ),
+        dtype=np.int32,
+    )
+
+    # Projected points and tier for each player, to randomize their points
+    projected = np.array(
+        [player.points[DRAFT_YEAR_KEY].projected_points for player in players],
+        dtype=np.float32,
+    )
+    tier_id = np.array(
+        [TIER_IDS.get(player.position_tier, -1) for player in players], dtype=np.int16
+    )
+
+    # Tier distributions as one padded float32 array, with the size of each tier
+    distribution_lists = [
+        getattr(league.position_tier_distributions, tier) for tier in TIERS
+    ]
+    distribution_sizes = np.array(
+        [len(values) for values in distribution_lists], dtype=np.int32
+    )
+    distributions = np.zeros(
+        (len(TIERS), max(1, distribution_sizes.max())), dtype=np.float32
+    )
+    for t, values in enumerate(distribution_lists):
+        distributions[t, : len(values)] = values
+
+    # Most randomized points allowed for each position
+    max_allowed = np.array(
+        [
+            int(
+                getattr(league.position_max_points, position)
+                * (1 + MAX_RANDOM_ADJUSTMENT)
+            )
+            for position in POSITIONS
+        ],
+        dtype=np.float64,
+    )
+
+    return {
+        "drafted": drafted,
+        "position_id": position_id,
+        "position_order": position_order,
+        "position_counts": position_counts,
+        "heads": heads,
+        "team_counts": team_counts,
+        "simulator_team": simulator_team,
+        "simulator_roster": simulator_roster,
+        "starter_sizes": starter_sizes,
+        "flex_size": ps.flex,
+        "flex_mask": flex_mask,
+        "projected": projected,
+        "tier_id": tier_id,
+        "distributions": distributions,
+        "distribution_sizes": distribution_sizes,
+        "max_allowed": max_allowed,
+        "draft_order": np.array(league.draft_order, dtype=np.int32),
+        "current_draft_turn": league.current_draft_turn,
+    }
+
+
+@dataclass
+class SimState:
+    """
+    The only state that a simulated draft changes, which is allocated once
+    and restored from the league's arrays before each simulated draft
+    """
+
+    drafted: np.ndarray
+    heads: np.ndarray
+    team_counts: np.ndarray
+    picks: np.ndarray
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "SimState":
+        """
+        Allocate the state with the same shapes as the league's arrays
+        """
+        return cls(
+            drafted=arrays["drafted"].copy(),
+            heads=arrays["heads"].copy(),
+            team_counts=arrays["team_counts"].copy(),
+            picks=np.full(max(0, len(arrays["draft_order"]) - 1), -1, dtype=np.int32),
+        )
+
+    def restore(self, arrays: dict):
+        """
+        Reset the state to the league's arrays without allocating
+        """
+        np.copyto(self.drafted, arrays["drafted"])
+        np.copyto(self.heads, arrays["heads"])
+        np.copyto(self.team_counts, arrays["team_counts"])
+
+
+"""
+KERNELS
+"""
+
+
+@njit(cache=True)
+def seed_kernels(seed):
+    """
+    Seed the random number generator used inside the kernels
+    (Numba keeps its own generator, separate from NumPy's)
+    """
+    np.random.seed(seed)
+
+
+@njit(cache=True)
+def best_available(drafted, position_order, position_counts, heads, position):
+    """
+    Return the index of the best undrafted player at a position (or -1 if none),
+    moving the position's head past any drafted players so the next lookup starts there
+    """
+    head = heads[position]
+    while head < position_counts[position] and drafted[position_order[position, head]]:
+        head += 1
+    heads[position] = head
+    if head < position_counts[position]:
+        return position_order[position, head]
+    return -1
+
+
+@njit(cache=True)
+def sim_pick(drafted, position_order, position_counts, heads, weights, class_mask):
+    """
+    Randomly choose a position using the weights and return the index
+    of the best undrafted player within that position
+    (a Bernoulli race, so positions without players are masked out instead of removed)
+    """
+    num_positions = weights.shape[0]
+    num_available = 0
+    max_weight = 0.0
+    for p in range(num_positions):
+        if (
+            class_mask[p]
+            and best_available(drafted, position_order, position_counts, heads, p) >= 0
+        ):
+            num_available += 1
+            if weights[p] > max_weight:
+                max_weight = weights[p]
+
+    # If there are no players left, there is nothing to pick
+    if num_available == 0:
+        return -1
+
+    # Draw positions uniformly and accept each one with probability weight / max weight
+    # (if the remaining weights are zero, this can happen at the end of the draft, just go random)
+    while True:
+        p = np.random.randint(0, num_positions)
+        if (
+            class_mask[p]
+            and heads[p] < position_counts[p]
+            and (max_weight == 0 or np.random.random() * max_weight < weights[p])
+        ):
+            return position_order[p, heads[p]]
+
+
+@njit(cache=True)
+def sim_draft(
+    drafted,
+    position_id,
+    position_order,
+    position_counts,
+    heads,
+    team_counts,
+    starter_sizes,
+    weights_table,
+    class_mask,
+    draft_order,
+    first_turn,
+    picks,
+):
+    """
+    Simulate the rest of a draft in place, filling picks with the player index drafted
+    with each pick in the draft order (or -1 if no player was available)
+    """
+    picks[:] = -1
+    num_positions = starter_sizes.shape[0]
+    for k in range(draft_order.shape[0]):
+        team = draft_order[k]
+        weights = weights_table[first_turn + k + 1].copy()
+
+        # Unless every starter is filled, avoid positions that are already filled
+        starting_filled = 0
+        for p in range(num_positions):
+            if team_counts[team, p] >= starter_sizes[p]:
+                starting_filled += 1
+        if starting_filled < num_positions:
+            for p in range(num_positions):
+                if team_counts[team, p] >= starter_sizes[p]:
+                    weights[p] = 0.0
+
+        # Draft the player
+        index = sim_pick(
+            drafted, position_order, position_counts, heads, weights, class_mask
+        )
+        if index < 0:
+            break
+        drafted[index] = True
+        team_counts[team, position_id[index]] += 1
+        picks[k] = index
+
+
+@njit(cache=True)
+def score_starters(
+    roster,
+    position_id,
+    projected,
+    tier_id,
+    distributions,
+    distribution_sizes,
+    max_allowed,
+    starter_sizes,
+    flex_size,
+    flex_mask,
+):
+    """
+    Randomize the points for each player on the roster using their tier's distribution,
+    then return the total points of the best starters (chosen like the Team's starters)
+    """
+    points = np.empty(roster.shape[0], dtype=np.float64)
+    for r in range(roster.shape[0]):
+        j = roster[r]
+        tier = tier_id[j]
+
+        # If the tier distribution is not available (DST & K), use the projected points
+        if tier < 0 or distribution_sizes[tier] == 0:
+            points[r] = projected[j]
+            continue
+
+        # Apply a random adjustment, limited by the max points (and zero)
+        adjustment = distributions[tier, np.random.randint(0, distribution_sizes[tier])]
+        randomized = round(projected[j] * (1.0 + adjustment))
+        if randomized > max_allowed[position_id[j]]:
+            randomized = max_allowed[position_id[j]]
+        elif randomized < 0:
+            randomized = 0
+        points[r] = randomized
+
+    # Take the best players at each position, then the best remaining RB, WR, or TE for flex
+    filled = np.zeros(starter_sizes.shape[0], dtype=np.int32)
+    flex_filled = 0
+    total = 0.0
+    for r in np.argsort(-points):
+        p = position_id[roster[r]]
+        if p < 0:
+            continue
+        if filled[p] < starter_sizes[p]:
+            filled[p] += 1
+            total += points[r]
+        elif flex_mask[p] and flex_filled < flex_size:
+            flex_filled += 1
+            total += points[r]
+    return total
+
+
+@njit(cache=True)
+def average_starter_points(
+    roster,
+    position_id,
+    projected,
+    tier_id,
+    distributions,
+    distribution_sizes,
+    max_allowed,
+    starter_sizes,
+    flex_size,
+    flex_mask,
+    randomizations,
+):
+    """
+    Return the average of the roster's randomized starter points over many randomizations
+    """
+    total = 0.0
+    for _ in range(randomizations):
+        total += score_starters(
+            roster,
+            position_id,
+            projected,
+            tier_id,
+            distributions,
+            distribution_sizes,
+            max_allowed,
+            starter_sizes,
+            flex_size,
+            flex_mask,
+        )
+    return total / randomizations
+
+
+def warm_up_kernels():
+    """
+    Call each kernel once on a tiny draft, so they are compiled (or loaded from the cache)
+    before the first request, and before the fork server starts the worker processes
+    """
+    drafted = np.zeros(len(POSITIONS), dtype=np.bool_)
+    position_id = np.arange(len(POSITIONS), dtype=np.int8)
+    position_order = np.arange(len(POSITIONS), dtype=np.int32).reshape(-1, 1)
+    position_counts = np.ones(len(POSITIONS), dtype=np.int32)
+    heads = np.zeros(len(POSITIONS), dtype=np.int32)
+    team_counts = np.zeros((1, len(POSITIONS)), dtype=np.int32)
+    starter_sizes = np.ones(len(POSITIONS), dtype=np.int32)
+    picks = np.full(1, -1, dtype=np.int32)
+    # Seed from fresh entropy, so that no kernel run afterwards is deterministic
+    seed_kernels(np.random.SeedSequence().generate_state(1)[0])
+    sim_draft(
+        drafted,
+        position_id,
+        position_order,
+        position_counts,
+        heads,
+        team_counts,
+        starter_sizes,
+        np.ones((2, len(POSITIONS)), dtype=np.float32),
+        np.ones(len(POSITIONS), dtype=np.bool_),
+        np.zeros(1, dtype=np.int32),
+        0,
+        picks,
+    )
+    scoring_arrays = (
+        picks,
+        position_id,
+        np.ones(len(POSITIONS), dtype=np.float32),
+        np.zeros(len(POSITIONS), dtype=np.int16),
+        np.zeros((len(TIERS), 1), dtype=np.float32),
+        np.ones(len(TIERS), dtype=np.int32),
+        np.ones(len(POSITIONS), dtype=np.float64),
+        starter_sizes,
+        ps.flex,
+        np.zeros(len(POSITIONS), dtype=np.bool_),
+    )
+    score_starters(*scoring_arrays)
+    average_starter_points(*scoring_arrays, 1)
+
+
+"""
+SIMULATION
+"""
+
+
+def has_converged(count: int, mean: float, m2: float, tolerance: float) -> bool:
+    """
+    Check whether the standard error of a running mean (tracked with Welford's algorithm)
+    is within the tolerance, as a fraction of the mean
+    """
+    if count < 2:
+        return False
+    standard_error = math.sqrt(m2 / (count - 1) / count)
+    return standard_error <= tolerance * abs(mean)
+
+
+def simulate_next_pick(
+    league: League, weights_table: np.ndarray, class_mask: np.ndarray
+) -> int:
+    """
+    Simulate only the league's next pick, with the same kernel as the simulated drafts,
+    and return the index of the player drafted (or -1 if no player is available)
+    """
+    arrays = build_sim_arrays(league)
+    picks = np.full(1, -1, dtype=np.int32)
+    sim_draft(
+        arrays["drafted"],
+        arrays["position_id"],
+        arrays["position_order"],
+        arrays["position_counts"],
+        arrays["heads"],
+        arrays["team_counts"],
+        arrays["starter_sizes"],
+        weights_table,
+        class_mask,
+        arrays["draft_order"][:1],
+        arrays["current_draft_turn"],
+        picks,
+    )
+    return int(picks[0])
+
+
+def run_trials(
+    arrays: dict,
+    weights_table: np.ndarray,
+    class_mask: np.ndarray,
+    positions: list,
+    seconds: float,
+    tolerance: float = 0,
+    seed: np.random.SeedSequence = None,
+) -> tuple:
+    """
+    Simulate drafts for each position until every position's average has converged
+    (or the time runs out) and return the simulator team's points for every draft
+    (with the number of drafts), as a pure function that can run in a worker process
+    on the league's arrays from build_sim_arrays
+    (each worker should get its own seed, spawned from the same seed sequence)
+    """
+    results = {position: [] for position in positions}
+
+    # Each simulation only restores the draft state from the league's arrays
+    state = SimState.from_arrays(arrays)
+    if seed is not None:
+        seed_kernels(seed.generate_state(1)[0])
+    draft_order = arrays["draft_order"]
+    simulator_team = arrays["simulator_team"]
+    simulator_turns = draft_order[1:] == simulator_team
+    simulator_roster = arrays["simulator_roster"]
+
+    # Running count, mean and sum of squared differences for each position
+    stats = {position: (0, 0.0, 0.0) for position in positions}
+    active_positions = list(positions)
+
+    # Begin the simulation
+    deadline = time.monotonic() + seconds
+    i = 0
+    trials = 0
+    while active_positions:
+        for position in active_positions:
+            state.restore(arrays)
+            best_index = best_available(
+                state.drafted,
+                arrays["position_order"],
+                arrays["position_counts"],
+                state.heads,
+                POSITION_IDS[position],
+            )
+            if best_index < 0:
+                points = 0  # No players left
+            else:
+                # Draft the best player at the position, then simulate the rest of the draft
+                state.drafted[best_index] = True
+                state.team_counts[draft_order[0], POSITION_IDS[position]] += 1
+                sim_draft(
+                    state.drafted,
+                    arrays["position_id"],
+                    arrays["position_order"],
+                    arrays["position_counts"],
+                    state.heads,
+                    state.team_counts,
+                    arrays["starter_sizes"],
+                    weights_table,
+                    class_mask,
+                    draft_order[1:],
+                    arrays["current_draft_turn"] + 1,
+                    state.picks,
+                )
+
+                # Get the points for the simulator team
+                picks = state.picks[simulator_turns]
+                roster = np.concatenate(
+                    (
+                        simulator_roster,
+                        [best_index] if draft_order[0] == simulator_team else [],
+                        picks[picks >= 0],
+                    )
+                ).astype(np.int32)
+                points = score_starters(
+                    roster,
+                    arrays["position_id"],
+                    arrays["projected"],
+                    arrays["tier_id"],
+                    arrays["distributions"],
+                    arrays["distribution_sizes"],
+                    arrays["max_allowed"],
+                    arrays["starter_sizes"],
+                    arrays["flex_size"],
+                    arrays["flex_mask"],
+                )
+                i += 1
+            results[position].append(points)
+
+            # Update the running statistics (Welford's algorithm)
+            count, mean, m2 = stats[position]
+            count += 1
+            delta = points - mean
+            mean += delta / count
+            m2 += delta * (points - mean)
+            stats[position] = (count, mean, m2)
+
+        # Periodically check the time limit, rather than after every trial
+        trials += 1
+        if trials % DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() >= deadline:
+            break
+
+        # Periodically stop simulating the positions whose averages have converged
+        if tolerance > 0 and trials % MONTE_CARLO_CHECK_INTERVAL == 0:
+            active_positions = [
+                position
+                for position in active_positions
+                if not has_converged(*stats[position], tolerance)
+            ]
+    return results, i
+
+
+def run_drafts(
+    arrays: dict,
+    weights_table: np.ndarray,
+    class_mask: np.ndarray,
+    runs: int,
+    seed: np.random.SeedSequence = None,
+) -> np.ndarray:
+    """
+    Simulate the rest of the draft several times and return how many times each player
+    was drafted with each remaining pick (as a picks by players array),
+    as a pure function that can run in a worker process on the league's arrays
+    """
+    state = SimState.from_arrays(arrays)
+    if seed is not None:
+        seed_kernels(seed.generate_state(1)[0])
+    draft_order = arrays["draft_order"]
+    picks = np.full(len(draft_order), -1, dtype=np.int32)
+    pick_numbers = np.arange(len(draft_order))
+    counts = np.zeros((len(draft_order), len(arrays["drafted"])), dtype=np.int32)
+    for _ in range(runs):
+        state.restore(arrays)
+        sim_draft(
+            state.drafted,
+            arrays["position_id"],
+            arrays["position_order"],
+            arrays["position_counts"],
+            state.heads,
+            state.team_counts,
+            arrays["starter_sizes"],
+            weights_table,
+            class_mask,
+            draft_order,
+            arrays["current_draft_turn"],
+            picks,
+        )
+        made = picks >= 0
+        counts[pick_numbers[made], picks[made]] += 1
+    return counts
+
+
+def randomized_team_points(league: League, randomizations: int) -> dict:
+    """
+    Return the average randomized starter points of each team in the league
+    (the same randomization as Player.randomized_points, compiled)
+    """
+    arrays = build_sim_arrays(league)
+    name_index = league.players._name_index
+    results = {}
+    for team in league.teams:
+        roster = np.array(
+            [name_index[player.name] for player in team.roster], dtype=np.int32
+        )
+        results[team.name] = average_starter_points(
+            roster,
+            arrays["position_id"],
+            arrays["projected"],
+            arrays["tier_id"],
+            arrays["distributions"],
+            arrays["distribution_sizes"],
+            arrays["max_allowed"],
+            arrays["starter_sizes"],
+            arrays["flex_size"],
+            arrays["flex_mask"],
+            randomizations,
+        )
+    return results
+
+
+# Compile the kernels when the module is imported
+warm_up_kernels()
@@ -5,17 +5,47 @@ Parses HTML table data and appends it to existing CSV files.
 """
 
 import os
-import re
 import csv
-from bs4 import BeautifulSoup
-from typing import List, Dict, Tuple, Optional
+from lxml import etree
+from typing import List, NamedTuple, Optional
+
+# Team abbreviations from the HTML that differ from the existing CSV format
+TEAM_MAPPING = {
+    'Buf': 'BUF',
+    'Chi': 'CHI', 
+    'Dal': 'DAL',
+    'NYJ': 'NYJ',
+    'GB': 'GB',
+    'LAC': 'LAC',
+    'Atl': 'ATL',
+    'Ind': 'IND',
+    'NO': 'NO',
+    # Add more mappings as needed
+}
+
+
+class PlayerRow(NamedTuple):
+    """A parsed player, in the column order of the CSV files (Season, Player, Pos, Team, Projected FFP)."""
+    season: str
+    player: str
+    pos: str
+    team: str
+    projected_ffp: str
 
 
 class FantasyFootballParser:
     def __init__(self):
         self.season = "2025"  # Default season
         
-    def parse_html_file(self, html_file_path: str) -> List[Dict[str, str]]:
+        # Compile the row lookups once, instead of parsing the expressions for every row
+        self._name_xpath = etree.XPath("(.//a[@class='AnchorLink link clr-link pointer'])[1]")
+        self._team_xpath = etree.XPath(self._class_xpath('span', 'playerinfo__playerteam'))
+        self._pos_xpath = etree.XPath(self._class_xpath('span', 'playerinfo__playerpos'))
+        self._points_xpath = etree.XPath(
+            "(.//div[@class='jsx-2810852873 table--cell fw-bold tc total tc sorted'])[1]"
+        )
+        
+    def parse_html_file(self, html_file_path: str) -> List[PlayerRow]:
         """
         Parse HTML file containing fantasy football table data.
         
@@ -23,22 +53,27 @@ class FantasyFootballParser:
             html_file_path: Path to HTML file
             
         Returns:
-            List of dictionaries containing player data
+            List of player rows
         """
         try:
-            with open(html_file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            
-            soup = BeautifulSoup(content, 'html.parser')
             players_data = []
             
-            # Find all table rows with player data
-            rows = soup.find_all('tr', {'data-player-row': True})
+            # Stream the table rows, so the whole document is never held in memory
+            rows = etree.iterparse(
+                html_file_path, events=('end',), tag='tr', html=True, encoding='utf-8'
+            )
             
-            for row in rows:
-                player_data = self._extract_player_data(row)
-                if player_data:
-                    players_data.append(player_data)
+            for _, row in rows:
+                # Only rows with player data
+                if row.get('data-player-row') is not None:
+                    player_data = self._extract_player_data(row)
+                    if player_data:
+                        players_data.append(player_data)
+                
+                # Free the row and any earlier siblings once they are parsed
+                row.clear()
+                while row.getprevious() is not None:
+                    del row.getparent()[0]
             
             return players_data
             
@@ -46,62 +81,96 @@ class FantasyFootballParser:
             print(f"Error parsing HTML file: {e}")
             return []
     
-    def _extract_player_data(self, row) -> Optional[Dict[str, str]]:
+    def _extract_player_data(self, row) -> Optional[PlayerRow]:
         """
         Extract player data from a table row.
         
         Args:
-            row: BeautifulSoup row element
+            row: lxml row element
             
         Returns:
-            Dictionary with player data or None if extraction fails
+            Player row or None if extraction fails
         """
         try:
             # Extract player name
-            name_element = row.find('a', class_='AnchorLink link clr-link pointer')
-            if not name_element:
+            name_element = self._first(self._name_xpath(row))
+            if name_element is None:
                 return None
-            player_name = name_element.get_text(strip=True)
+            player_name = self._get_text(name_element)
             
             # Extract team and position
-            team_element = row.find('span', class_='playerinfo__playerteam')
-            pos_element = row.find('span', class_='playerinfo__playerpos')
+            team_element = self._first(self._team_xpath(row))
+            pos_element = self._first(self._pos_xpath(row))
             
-            if not team_element or not pos_element:
+            if team_element is None or pos_element is None:
                 return None
                 
-            team = team_element.get_text(strip=True)
-            position = pos_element.get_text(strip=True)
+            team = self._get_text(team_element)
+            position = self._get_text(pos_element)
             
             # Extract fantasy points (last column with fantasy points)
-            points_element = row.find('div', class_='jsx-2810852873 table--cell fw-bold tc total tc sorted')
-            if not points_element:
+            points_element = self._first(self._points_xpath(row))
+            if points_element is None:
                 return None
                 
-            points_span = points_element.find('span')
-            if not points_span:
+            points_span = points_element.find('.//span')
+            if points_span is None:
                 return None
                 
-            fantasy_points = points_span.get_text(strip=True)
+            fantasy_points = self._get_text(points_span)
             
             # Handle missing data - convert "--" to "0"
-            fantasy_points = self._handle_missing_data(fantasy_points)
+            if not fantasy_points or fantasy_points == '--':
+                fantasy_points = '0'
             
             # Convert team abbreviations to match existing data format
             team = self._normalize_team_name(team)
             
-            return {
-                'Season': self.season,
-                'Player': player_name,
-                'Pos': position,
-                'Team': team,
-                'Projected FFP': fantasy_points
-            }
+            return PlayerRow(self.season, player_name, position, team, fantasy_points)
             
         except Exception as e:
             print(f"Error extracting player data from row: {e}")
             return None
     
+    @staticmethod
+    def _class_xpath(tag: str, class_name: str) -> str:
+        """
+        Build an XPath for the first descendant with the given tag that has the given class.
+        
+        Args:
+            tag: Tag name of the descendant
+            class_name: One of the descendant's classes
+            
+        Returns:
+            XPath expression relative to a row
+        """
+        return f"(.//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')])[1]"
+    
+    @staticmethod
+    def _first(elements: list):
+        """
+        Get the first element of an XPath result.
+        
+        Args:
+            elements: Elements matched by an XPath
+            
+        Returns:
+            The first lxml element or None if nothing matched
+        """
+        return elements[0] if elements else None
+    
+    def _get_text(self, element) -> str:
+        """
+        Get the stripped text of an element and its children.
+        
+        Args:
+            element: lxml element
+            
+        Returns:
+            Text with each piece stripped, joined together
+        """
+        return ''.join(text.strip() for text in element.itertext())
+    
     def _normalize_team_name(self, team: str) -> str:
         """
         Normalize team names to match existing CSV format.
@@ -112,28 +181,15 @@ class FantasyFootballParser:
         Returns:
             Normalized team abbreviation
         """
-        team_mapping = {
-            'Buf': 'BUF',
-            'Chi': 'CHI', 
-            'Dal': 'DAL',
-            'NYJ': 'NYJ',
-            'GB': 'GB',
-            'LAC': 'LAC',
-            'Atl': 'ATL',
-            'Ind': 'IND',
-            'NO': 'NO',
-            # Add more mappings as needed
-        }
-        
-        return team_mapping.get(team, team.upper())
+        return TEAM_MAPPING.get(team) or team.upper()
     
-    def append_to_csv(self, csv_file_path: str, players_data: List[Dict[str, str]]) -> bool:
+    def append_to_csv(self, csv_file_path: str, players_data: List[PlayerRow]) -> bool:
         """
         Append player data to existing CSV file.
         
         Args:
             csv_file_path: Path to CSV file
-            players_data: List of player dictionaries
+            players_data: List of player rows
             
         Returns:
             True if successful, False otherwise
@@ -148,13 +204,14 @@ class FantasyFootballParser:
                 print(f"CSV file does not exist: {csv_file_path}")
                 return False
             
-            # Append data to CSV
-            with open(csv_file_path, 'a', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['Season', 'Player', 'Pos', 'Team', 'Projected FFP']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            # Append data to CSV, buffering all the rows into one write
+            with open(csv_file_path, 'a', newline='', encoding='utf-8', buffering=1024 * 1024) as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerows(players_data)
                 
-                for player in players_data:
-                    writer.writerow(player)
+                # Flush the buffer once and sync it to disk before reporting success
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
             
             print(f"Successfully appended {len(players_data)} players to {csv_file_path}")
             return True
@@ -188,12 +245,12 @@ class FantasyFootballParser:
                 print(f"File not found: {user_input}")
                 print("Please enter a valid file path.")
     
-    def preview_data(self, players_data: List[Dict[str, str]], num_records: int = 5) -> None:
+    def preview_data(self, players_data: List[PlayerRow], num_records: int = 5) -> None:
         """
         Preview parsed player data.
         
         Args:
-            players_data: List of player dictionaries
+            players_data: List of player rows
             num_records: Number of records to preview
         """
         if not players_data:
@@ -204,7 +261,7 @@ class FantasyFootballParser:
         print("-" * 80)
         
         for i, player in enumerate(players_data[:num_records]):
-            print(f"{i+1}. {player['Player']} ({player['Pos']}, {player['Team']}) - {player['Projected FFP']} points")
+            print(f"{i+1}. {player.player} ({player.pos}, {player.team}) - {player.projected_ffp} points")
         
         if len(players_data) > num_records:
             print(f"... and {len(players_data) - num_records} more records")